@@ -0,0 +1,5 @@
+import os
+import py
+
+# pytest ships a legacy 'py' module shadowing this repository's py folder, modules are looked up in the folder too
+py.__path__ = list(getattr(py, '__path__', [])) + [os.path.join(os.path.dirname(os.path.abspath(__file__)), 'py')]
@@ -0,0 +1,88 @@
+import re
+
+# A cashtag is '$' followed by a letter and up to 9 letters/digits, with optional class suffix ($BRK.B).
+# Bare tickers are upper case tokens of 2-10 letters/digits, only kept if they are known cryptos.
+CASHTAG_REGEX = re.compile(r'(?<![\w$])\$([A-Za-z][A-Za-z0-9]{0,9}(?:\.[A-Za-z])?)(?![\w$])|(?<![\w$@#])([A-Z][A-Z0-9]{1,9})(?![\w$])')
+
+# Upper case words commonly shouted in alerts which are also listed as crypto symbols
+STOP_WORDS = {
+    'ALL', 'AND', 'ARE', 'ATH', 'BIG', 'BUY', 'CEO', 'DD', 'EOD', 'FOR', 'GET', 'HOLD', 'IMO', 'IPO', 'LOL',
+    'MOON', 'NEW', 'NFT', 'NOT', 'NOW', 'OTC', 'OUT', 'PUMP', 'SEC', 'SELL', 'THE', 'USA', 'USD', 'YOU'
+}
+
+class CashtagExtractor():
+    """
+    CashtagExtractor class finds symbols in tweet text against the known stocks and cryptos symbols.
+    Text is scanned by a single precompiled regex and matches are looked up in symbol sets,
+    '$' prefixed cashtags are always kept, bare upper case tickers only if they are known cryptos.
+
+    Methods
+    -------
+    extract(text)
+        Returns list of (symbol, asset class hint) found in text
+    extract_many(texts)
+        Yields list of (symbol, asset class hint) for every text
+    """
+
+    def __init__(self, stock_symbols, crypto_symbols, min_bare_length=3, stop_words=STOP_WORDS):
+        """
+        Instantiates CashtagExtractor with known stocks and cryptos symbols
+
+        Parameters
+        ----------
+        arg1 : iterable
+            stock symbols (cached stocks)
+        arg2 : iterable
+            crypto symbols (Coingecko symbols)
+        arg3 : int
+            minimum length of bare (without '$') crypto tickers (default=3)
+        arg4 : set
+            upper case words never taken as bare tickers (default=STOP_WORDS)
+        """
+        self.stocks = {symbol.upper() for symbol in stock_symbols}
+        self.cryptos = {symbol.upper() for symbol in crypto_symbols}
+        self.bare = {symbol for symbol in self.cryptos if len(symbol) >= min_bare_length} - set(stop_words)
+        self.hints = {symbol: 'Stocks' for symbol in self.stocks - self.cryptos}
+        self.hints.update({symbol: 'Cryptos' for symbol in self.cryptos - self.stocks})
+
+    def extract(self, text):
+        """
+        Returns symbols found in text, in order of first appearance without repeats
+
+        Parameters
+        ----------
+        arg1 : str
+            tweet text
+
+        Returns
+        -------
+        list
+            list of (symbol, asset class hint), hint is Stocks or Cryptos if the symbol is known to only one of them else None
+        """
+        found = {}
+        for tag, bare in CASHTAG_REGEX.findall(text):
+            if tag:
+                symbol = tag.upper()
+                if symbol not in found:
+                    found[symbol] = self.hints.get(symbol)
+            elif bare in self.bare and bare not in found:
+                found[bare] = 'Cryptos'
+        return list(found.items())
+
+    def extract_many(self, texts):
+        """
+        Yields symbols found in each text of texts
+
+        Parameters
+        ----------
+        arg1 : iterable
+            tweet texts
+
+        Returns
+        -------
+        generator
+            list of (symbol, asset class hint) for every text, see extract()
+        """
+        extract = self.extract
+        for text in texts:
+            yield extract(text)
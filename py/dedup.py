@@ -0,0 +1,47 @@
+import hashlib, re
+
+RETWEET_REGEX = re.compile(r'^RT @\w+:\s*')
+URL_REGEX = re.compile(r'https?://\S+')
+SPACE_REGEX = re.compile(r'\s+')
+
+def normalize_text(text):
+    """
+    Returns tweet text normalized for comparing alerts: retweet prefix and links removed,
+    lower case, truncation ellipsis dropped and whitespace collapsed
+
+    Parameters
+    ----------
+    arg1 : str
+        tweet text
+
+    Returns
+    -------
+    str
+        normalized text
+    """
+    text = RETWEET_REGEX.sub('', text)
+    text = URL_REGEX.sub(' ', text)
+    text = SPACE_REGEX.sub(' ', text.lower()).strip()
+    return text.rstrip('\u2026').rstrip()
+
+def alert_key(text, symbol, dtime):
+    """
+    Returns key identifying an alert: hash of normalized tweet text, symbol and alert minute.
+    Copies of the same alert (retweets, repeated posts within the minute) share the key and have the same prices.
+
+    Parameters
+    ----------
+    arg1 : str
+        tweet text
+    arg2 : str
+        symbol of the alert
+    arg3 : datetime
+        alert or created datetime object
+
+    Returns
+    -------
+    tuple
+        (text hash, symbol, minute)
+    """
+    digest = hashlib.blake2b(normalize_text(text).encode('utf-8'), digest_size=8).hexdigest()
+    return digest, symbol.upper(), dtime.replace(second=0, microsecond=0)
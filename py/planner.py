@@ -0,0 +1,90 @@
+import datetime, logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s', datefmt='%d-%b-%y %H:%M:%S')
+
+# Prices are needed up to 1 week after the alert (1w horizon)
+HORIZON = datetime.timedelta(days=7)
+
+def to_utc(dtime):
+    """
+    Returns datetime as naive UTC, the time zone cached prices and tweet times are compared in
+
+    Parameters
+    ----------
+    arg1 : datetime
+        naive (already UTC) or timezone aware datetime
+
+    Returns
+    -------
+    datetime
+        naive UTC datetime
+    """
+    if dtime.tzinfo is None:
+        return dtime
+    return dtime.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+
+def plan_downloads(alerts, stores):
+    """
+    Plans downloads for a list of alerts. Alerts are grouped by (store, symbol) with the time range
+    their prices are needed for, and the groups not covered by the local cache are ordered by priority:
+    most alerts first, then earliest alert first.
+
+    Parameters
+    ----------
+    arg1 : iterable
+        alerts as (symbol, datetime, store name) tuples
+    arg2 : dict
+        store name (Stocks or Cryptos) -> StocksData or CryptosData object
+
+    Returns
+    -------
+    list
+        list of planned downloads, each a dict (Store, Symbol, Start, Until, Alerts, Cached)
+    """
+    plan = {}
+    now = to_utc(datetime.datetime.now(datetime.timezone.utc))
+    for symbol, dtime, store in alerts:
+        dtime = to_utc(dtime)
+        key = (store, symbol.upper())
+        if key not in plan:
+            plan[key] = {'Store' : store, 'Symbol' : key[1], 'Start' : dtime, 'Until' : dtime, 'Alerts' : 0}
+        entry = plan[key]
+        entry['Start'] = min(entry['Start'], dtime)
+        entry['Until'] = max(entry['Until'], dtime)
+        entry['Alerts'] += 1
+
+    for entry in plan.values():
+        entry['Until'] = min(entry['Until'] + HORIZON, now)
+        entry['Cached'] = stores[entry['Store']].is_cached(entry['Symbol'], entry['Start'], entry['Until'])
+
+    return sorted(plan.values(), key=lambda entry: (entry['Cached'], -entry['Alerts'], entry['Start']))
+
+def prefetch(alerts, stores):
+    """
+    Downloads data of all symbols of the alerts up front, in planned order, before they are priced.
+    Alerts are planned in their preffered store first, symbols without data there are then planned
+    in the other store, as get_prices falls back to it.
+
+    Parameters
+    ----------
+    arg1 : list
+        alerts as (symbol, datetime, preffered store name) tuples
+    arg2 : dict
+        store name (Stocks or Cryptos) -> StocksData or CryptosData object
+    """
+    fallback = {'Stocks' : 'Cryptos', 'Cryptos' : 'Stocks'}
+    for phase in ('preffered', 'fallback'):
+        plan = plan_downloads(alerts, stores)
+        downloads = sum(1 for entry in plan if not entry['Cached'])
+        logging.info(f"Prefetching {phase} data: {len(plan)} symbols, {downloads} to download")
+
+        missing = set()
+        for entry in plan:
+            if not stores[entry['Store']].prefetch(entry['Symbol'], entry['Start'], entry['Until']):
+                missing.add((entry['Store'], entry['Symbol']))
+
+        alerts = [(symbol, dtime, fallback[store]) for symbol, dtime, store in alerts if (store, symbol.upper()) in missing]
+        if not alerts:
+            break
+
+    logging.info(f"Prefetch done, {len(missing)} symbols without data")
@@ -1,5 +1,6 @@
-import os, glob, datetime, requests, io, logging, time, json
+import datetime, requests, io, logging, time, json
 import pandas as pd
+from py.tiers import TieredData, STOCK_AGG, RAW_DAYS, ROLLUP_DAYS
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s', datefmt='%d-%b-%y %H:%M:%S')
 
@@ -52,9 +53,10 @@ class AlphavantageAPI():
     #     self.curr_count = 0
 
 
-class StocksData():
+class StocksData(TieredData):
     """
     StocksData class gets all relvent stocks prices for a given symbol and datetime object.
+    Bars are downloaded from Alphavantage and current prices from IEXcloud, caching is done by TieredData.
     
     Methods
     -------
@@ -65,7 +67,7 @@ class StocksData():
         saves all stocks dataframe downladed to (data_folder) folder
     """
 
-    def __init__(self, data_folder, API_List, IEX_API):
+    def __init__(self, data_folder, API_List, IEX_API, raw_days=RAW_DAYS, rollup_days=ROLLUP_DAYS):
         """
         Initiantes StocksData class with (data_folder) path for saving downloaded stock data and 
         (API_List) a list ot Alphavantage APIs
@@ -78,83 +80,44 @@ class StocksData():
             (APIs) List of Alphavantage APis
         arg3 : str:
             IEXCloud Api for getting current price
+        arg4 : int
+            days of 1-min bars kept, older bars are rolled up to 5-min bars (default=RAW_DAYS)
+        arg5 : int
+            days of 5-min bars kept, older bars are rolled up to hourly bars (default=ROLLUP_DAYS)
         """
-        self.data_folder = data_folder
+        super().__init__(data_folder, 'stocks', STOCK_AGG, 'close', '1111100', raw_days, rollup_days)
         self.IEX_API = IEX_API
-        all_files = glob.glob(os.path.join(data_folder, "*.csv"))
-        self.stocks_df = {}
 
         logging.debug("Fetching Alphavantage APIs")
         
         self.apis =  AlphavantageAPI(API_List)
-        
-        logging.info(f"Reading stocks csv from {data_folder}")
-        for file in all_files:
-            file_name = os.path.splitext(os.path.basename(file))[0]
-            dfn = pd.read_csv(file)
-            dfn['time'] =  pd.to_datetime(dfn['time'])
-            self.stocks_df[file_name] = dfn
 
-    def get_prices(self, symbol, dtime):
+    def _download(self, symbol):
         """
-        Returns tuple of prices for the stock (symbol) and dtime as Alert time (Alert Price, 2hr, 4hr, 1D, 1W)
+        Downloads 1-min bars of the stock(symbol) from Aplhavantage database
         
         Parameters
         ----------
         arg1 : str
             Stock Symbol
-        arg2 : datetime
-            Alert or created datetime object
+    
         Returns
         -------
-        tuple
-            Returns tuple of prices (Alert Price, 2hr, 4hr, 1D, 1W)
-        """
-        dtime = dtime.replace(second=0)
-        symbol = symbol.upper()
-        df = self.__download_df(symbol)
-        if df.empty:
-            ''' Return NA if no stock found in Alphavnatage datbase'''
-            return 'NA', 'NA', 'NA', 'NA', 'NA', 'NA'
-
-        alert_price = self.__get_price(df, dtime)
-        two_hr_price = self.__get_price(df, dtime + datetime.timedelta(hours=2))
-        four_hr_price = self.__get_price(df, dtime + datetime.timedelta(hours=4))
-        one_d_price = self.__get_price(df, dtime + datetime.timedelta(days=1))
-        one_w_price = self.__get_price(df, dtime + datetime.timedelta(days=7))
-        current_price = self.__get_current_price(symbol)
-
-        return alert_price, two_hr_price, four_hr_price, one_d_price, one_w_price, current_price
-        
-
-    def save_data(self):
-        """
-        Saves all downloaded data into local machine (path=self.data_folder)
-        """
-        symbols = self.stocks_df.keys()
-        for symbol in symbols:
-            saveas = os.path.join(self.data_folder, f'{symbol}.csv')
-            self.stocks_df[symbol].to_csv(saveas, index=False)
-        logging.info(f"Stocks data saved to {self.data_folder}")
-
-    def __save_symbol(self, df, symbol):
-        """
-        Saves individial downloaded data of stock(symbol)into local machine (path=self.data_folder)
-        
-        Parameters
-        ----------
-        arg1 : Pandas Dataframe
-            df, stock's downloaded data
-        arg2 : str
-            =Stock's symbol
+        Pandas DataFrame
+            downloaded data as dataframe, None if nothing was downloaded
         """
-        saveas = os.path.join(self.data_folder, f'{symbol}.csv')
-        df.to_csv(saveas, index=False)
-        logging.info(f"{symbol} data saved to {self.data_folder}")
+        response = self.__get_response(symbol)
+        if not response:
+            return None
+        df = pd.read_csv(io.StringIO(response.text), sep=",")
+        if 'time' not in df.columns:
+            logging.warning(f"No data of {symbol} in Alphavantage response.")
+            return None
+        return df
 
-    def __get_current_price(self, symbol):
+    def _current_price(self, symbol):
         """
-        Method returns current price of the stock from IEXcloud server
+        Returns current price of the stock from IEXcloud server
         
         Parameters
         ----------
@@ -171,85 +134,6 @@ class StocksData():
         response = requests.get(url, timeout=30).json()
         return response['iexClose']
 
-    def __get_price(self, df, dtime):
-        """
-        Private method returns price of the stock at particular date-time(dtime)
-        
-        Parameters
-        ----------
-        arg1 : Pandas Dataframe
-            Dataframe of the stock
-        arg2 : datetime
-            datetime of the price requires
-        Returns
-        -------
-        float
-            Returns price of exist 
-        str
-            Return NA if no price found for particlar time
-        """
-        if len(df.index) > 1:
-            dates = pd.to_datetime(df['time']).dt.date.unique().tolist()
-            start_date = df['time'].iloc[0]
-            while True:
-                value = df.loc[df['time'] == dtime, 'close'].values
-                
-                if (value.size > 0) or (dtime > start_date): 
-                    break
-                if dtime.date() not in dates:
-                    dtime = dtime + datetime.timedelta(days=1)
-                else:
-                    dtime = dtime + datetime.timedelta(minutes=1)
-
-            return value[0] if value.size > 0 else 'NA'   
-        
-        logging.debug("Empty dataframe")
-        return 'NA'     
-
-    def __download_df(self, symbol):
-        """
-        Private method to downloads data from Aplhavantage database for the stock(symbol)
-        
-        Parameters
-        ----------
-        arg1 : str
-            Stock Symbol
-    
-        Returns
-        -------
-        Pandas DataFrame
-            downloaded data as dataframe
-        """
-        download = False
-        if symbol in self.stocks_df.keys():
-            dfs = self.stocks_df[symbol]
-            
-            start_date = dfs['time'].iloc[0].to_pydatetime().date()
-            today = datetime.date.today() - datetime.timedelta(days=1)
-            if today > start_date:
-                download = True
-        else:
-            dfs = pd.DataFrame(columns=['time','open','high','low','close','volume'])
-            download = True
-            
-        if download:
-            logging.debug(f"{symbol}: New download")
-
-            response = self.__get_response(symbol)
-            if response:
-                df = pd.read_csv(io.StringIO(response.text), sep=",")
-                dfs = dfs.append(df, ignore_index = True)
-                dfs['time'] =  pd.to_datetime(dfs['time']) 
-
-                dfs.drop_duplicates(keep='first',inplace=True) 
-                dfs = dfs.sort_values(by=['time'], ascending=False)
-                    
-        if not dfs.empty:
-            self.stocks_df[symbol] = dfs
-            self.__save_symbol(dfs, symbol)
-            return dfs
-        return dfs
-
     def __get_response(self, symbol):
         """
         Returns the response from Alphavantage.
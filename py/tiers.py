@@ -0,0 +1,471 @@
+import os, glob, datetime, logging
+import numpy as np
+import pandas as pd
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s', datefmt='%d-%b-%y %H:%M:%S')
+
+# Bars of the last RAW_DAYS are kept at 1-min resolution, older bars are rolled up to 5-min
+# and bars older than ROLLUP_DAYS to hourly. Ages are measured from the latest bar of the symbol.
+# RAW_DAYS covers the default harvest window (30 days) plus the 1w price horizon, so alerts
+# harvested by default are priced from 1-min bars.
+RAW_DAYS = 37
+ROLLUP_DAYS = 90
+
+# Alphavantage (year1month1 slice) and Coingecko (days=30) both serve the last 30 days of prices
+HISTORY_DAYS = 30
+
+STOCK_AGG = {'open' : 'first', 'high' : 'max', 'low' : 'min', 'close' : 'last', 'volume' : 'sum'}
+CRYPTO_AGG = {'price' : 'last'}
+
+def rollup(df, agg, raw_days=RAW_DAYS, rollup_days=ROLLUP_DAYS):
+    """
+    Rolls up bars older than (raw_days) to 5-min bars and older than (rollup_days) to hourly bars.
+    Bar length in minutes is kept in 'bar' column (1 for raw bars), rolled up bars are labelled by their start time.
+
+    Parameters
+    ----------
+    arg1 : Pandas Dataframe
+        bars of a symbol, 'time' column and price columns
+    arg2 : dict
+        price column -> aggregation (STOCK_AGG or CRYPTO_AGG)
+    arg3 : int
+        days of 1-min bars kept (default=RAW_DAYS)
+    arg4 : int
+        days of 5-min bars kept (default=ROLLUP_DAYS)
+
+    Returns
+    -------
+    Pandas Dataframe
+        bars sorted by time (latest first)
+    """
+    df = df.copy()
+    df['bar'] = df['bar'].fillna(1).astype(int) if 'bar' in df.columns else 1
+    if df.empty:
+        return df
+
+    df = df.sort_values(by=['time'], kind='stable')
+    latest = df['time'].iloc[-1]
+    for minutes, days in ((5, raw_days), (60, rollup_days)):
+        roll = (df['time'] < latest - datetime.timedelta(days=days)) & (df['bar'] <= minutes)
+        if not roll.any():
+            continue
+        # OHLCV aggregations compose, so finer bars merge with already rolled bars of the same bucket
+        rolled = df[roll].groupby(df.loc[roll, 'time'].dt.floor(f'{minutes}min')).agg(agg)
+        rolled = rolled.rename_axis('time').reset_index()
+        rolled['bar'] = minutes
+        df = pd.concat([df[~roll], rolled], ignore_index=True).sort_values(by=['time'], kind='stable')
+
+    return df[['time'] + list(agg) + ['bar']].iloc[::-1].reset_index(drop=True)
+
+def merge(cached, downloaded):
+    """
+    Merges downloaded 1-min bars into cached bars of a symbol.
+    Downloaded bars falling inside already rolled up bars are dropped, they are already accounted for.
+
+    Parameters
+    ----------
+    arg1 : Pandas Dataframe
+        cached bars
+    arg2 : Pandas Dataframe
+        downloaded 1-min bars
+
+    Returns
+    -------
+    Pandas Dataframe
+        merged bars without duplicates, sorted by time (latest first)
+    """
+    downloaded = downloaded.copy()
+    downloaded['time'] = pd.to_datetime(downloaded['time'])
+    downloaded['bar'] = 1
+
+    if 'bar' in cached.columns and (cached['bar'] > 1).any():
+        rolled = cached[cached['bar'] > 1].sort_values(by=['time'])
+        starts = rolled['time'].values
+        ends = starts + pd.to_timedelta(rolled['bar'].values, unit='min').values
+        i = np.searchsorted(starts, downloaded['time'].values, side='right') - 1
+        covered = (i >= 0) & (downloaded['time'].values < ends[np.maximum(i, 0)])
+        downloaded = downloaded[~covered]
+
+    dfs = pd.concat([cached, downloaded] if not cached.empty else [downloaded], ignore_index=True)
+    dfs['time'] = pd.to_datetime(dfs['time'])
+    dfs['bar'] = dfs['bar'].fillna(1).astype(int)
+    dfs = dfs.drop_duplicates(keep='first')
+    return dfs.sort_values(by=['time'], ascending=False)
+
+def get_price(df, dtime, column):
+    """
+    Returns (column) price of the bars at date-time(dtime).
+    A rolled up bar containing dtime is used, else the first bar at or after dtime is used, days without
+    any bars are skipped keeping time of the day.
+    Price of a rolled up bar is its closing price, i.e. up to one bar (5 min or 1 hour) after dtime.
+
+    Parameters
+    ----------
+    arg1 : Pandas Dataframe
+        bars of a symbol sorted by time (latest first)
+    arg2 : datetime
+        datetime of the price required
+    arg3 : str
+        price column
+    Returns
+    -------
+    float
+        Returns price if exists
+    str
+        Return NA if no price found for particular time
+    """
+    if len(df.index) > 1:
+        times = df['time'].values[::-1]
+        values = df[column].values[::-1]
+        bars = df['bar'].values[::-1] if 'bar' in df.columns else np.ones(len(times), dtype=int)
+        dtime = pd.Timestamp(dtime).to_datetime64()
+        one_day = np.timedelta64(1, 'D')
+
+        # A bar containing dtime starts on the day of dtime, so days without bars are skipped first
+        while dtime <= times[-1]:
+            day = dtime.astype('datetime64[D]')
+            j = np.searchsorted(times, day)
+            if j < len(times) and times[j] < day + one_day:
+                break
+            dtime = dtime + one_day
+
+        i = np.searchsorted(times, dtime, side='right') - 1
+        if i >= 0 and times[i] + np.timedelta64(int(bars[i]), 'm') > dtime:
+            return values[i]
+
+        j = np.searchsorted(times, dtime)
+        return values[j] if j < len(times) else 'NA'
+
+    logging.debug("Empty dataframe")
+    return 'NA'
+
+
+class TieredData():
+    """
+    TieredData class is the base of StocksData and CryptosData, it keeps the local cache of 1-min bars
+    of every symbol rolled up to tiered resolution, and prices alerts from it.
+    Subclasses download bars and current prices from their server by implementing _download(symbol)
+    and _current_price(symbol).
+
+    Methods
+    -------
+    get_prices(symbol, datetime)
+        Returns tuple of prices (Alert Price, 2hr, 4hr, 1D, 1W, current price)
+    save_data()
+        Saves all data downloaded to (data_folder) folder
+    get_symbols()
+        Returns symbols cached or downloaded in this session
+    is_cached(symbol, start, until)
+        Checks whether local data of the symbol needs no download
+    prefetch(symbol, start, until)
+        Downloads data and current price of the symbol if needed
+    migrate_cache()
+        Rewrites every cached csv rolled up to tiered resolution
+    """
+
+    def __init__(self, data_folder, name, agg, column, weekmask, raw_days=RAW_DAYS, rollup_days=ROLLUP_DAYS):
+        """
+        Instantiates TieredData class with (data_folder) path of the cached csv files
+
+        Parameters
+        ----------
+        arg1 : str
+            (data_folder) Folder path for saving downloaded files
+        arg2 : str
+            name of the asset class used in logs (stocks or cryptos)
+        arg3 : dict
+            price column -> aggregation (STOCK_AGG or CRYPTO_AGG)
+        arg4 : str
+            price column alerts are priced from
+        arg5 : str
+            numpy weekmask of the trading days ('1111100' for stocks, '1111111' for cryptos)
+        arg6 : int
+            days of 1-min bars kept, older bars are rolled up to 5-min bars (default=RAW_DAYS)
+        arg7 : int
+            days of 5-min bars kept, older bars are rolled up to hourly bars (default=ROLLUP_DAYS)
+        """
+        self.data_folder = data_folder
+        self.name = name
+        self.agg = agg
+        self.column = column
+        self.weekmask = weekmask
+        self.raw_days = raw_days
+        self.rollup_days = rollup_days
+        self.data_df = {}
+
+        # Cached csv files are only indexed here, each one is read on first use of the symbol
+        logging.info(f"Indexing {name} csv from {data_folder}")
+        self.cached_files = {}
+        self.checked = set()
+        self.current_prices = {}
+        for file in glob.glob(os.path.join(data_folder, "*.csv")):
+            file_name = os.path.splitext(os.path.basename(file))[0]
+            self.cached_files[file_name] = file
+
+    def get_prices(self, symbol, dtime):
+        """
+        Returns tuple of prices for the (symbol) and dtime as Alert time (Alert Price, 2hr, 4hr, 1D, 1W, current price)
+
+        Parameters
+        ----------
+        arg1 : str
+            Symbol
+        arg2 : datetime
+            Alert or created datetime object
+        Returns
+        -------
+        tuple
+            Returns tuple of prices (Alert Price, 2hr, 4hr, 1D, 1W, current price)
+        """
+        dtime = dtime.replace(second=0)
+        symbol = symbol.upper()
+        df = self.__download_df(symbol)
+        if df.empty:
+            ''' Return NA if the symbol is not found in the server database'''
+            return 'NA', 'NA', 'NA', 'NA', 'NA', 'NA'
+
+        alert_price = get_price(df, dtime, self.column)
+        two_hr_price = get_price(df, dtime + datetime.timedelta(hours=2), self.column)
+        four_hr_price = get_price(df, dtime + datetime.timedelta(hours=4), self.column)
+        one_d_price = get_price(df, dtime + datetime.timedelta(days=1), self.column)
+        one_w_price = get_price(df, dtime + datetime.timedelta(days=7), self.column)
+        current_price = self.__get_current_price(symbol)
+
+        return alert_price, two_hr_price, four_hr_price, one_d_price, one_w_price, current_price
+
+    def save_data(self):
+        """
+        Saves all downloaded data into local machine (path=self.data_folder)
+        """
+        for symbol, df in self.data_df.items():
+            saveas = os.path.join(self.data_folder, f'{symbol}.csv')
+            df.to_csv(saveas, index=False)
+        logging.info(f"{self.name.capitalize()} data saved to {self.data_folder}")
+
+    def get_symbols(self):
+        """
+        Returns symbols cached in (data_folder) or downloaded in this session
+
+        Returns
+        -------
+        list
+            list of symbols
+        """
+        return sorted(set(self.cached_files) | set(self.data_df))
+
+    def is_cached(self, symbol, start=None, until=None):
+        """
+        Checks whether local data of the (symbol) needs no download.
+        Data is compared by trading day: it covers the range if no trading day between (start) and its earliest
+        price and none between its latest price and (until) or yesterday, whichever is earlier, is missing.
+        (start) is capped at HISTORY_DAYS ago as older prices can not be downloaded. Exchange holidays are not known,
+        a holiday next to the cached range counts as missing.
+
+        Parameters
+        ----------
+        arg1 : str
+            Symbol
+        arg2 : datetime
+            earliest time the prices are needed for (default=None)
+        arg3 : datetime
+            latest time the prices are needed for (default=None)
+
+        Returns
+        -------
+        bool
+            True if no download is needed
+        """
+        symbol = symbol.upper()
+        if symbol in self.checked:
+            return True
+        dfs = self.__load_symbol(symbol)
+        if dfs is None or dfs.empty:
+            return False
+        earliest = dfs['time'].iloc[-1].to_pydatetime()
+        latest = dfs['time'].iloc[0].to_pydatetime()
+        today = datetime.datetime.now(datetime.timezone.utc).date()
+        one_day = datetime.timedelta(days=1)
+
+        if start is not None:
+            first = max(start.date(), today - datetime.timedelta(days=HISTORY_DAYS))
+            if np.busday_count(first, earliest.date(), weekmask=self.weekmask) > 0:
+                return False
+
+        if until is not None and latest >= until:
+            return True
+        last = today - one_day if until is None else min(until.date(), today - one_day)
+        return bool(np.busday_count(latest.date() + one_day, last + one_day, weekmask=self.weekmask) <= 0)
+
+    def prefetch(self, symbol, start=None, until=None):
+        """
+        Downloads data and current price of the (symbol) if needed, so get_prices runs on local data
+
+        Parameters
+        ----------
+        arg1 : str
+            Symbol
+        arg2 : datetime
+            earliest time the prices are needed for, see is_cached() (default=None)
+        arg3 : datetime
+            latest time the prices are needed for, see is_cached() (default=None)
+
+        Returns
+        -------
+        bool
+            True if any data of the symbol is available
+        """
+        symbol = symbol.upper()
+        df = self.__download_df(symbol, start, until)
+        if df.empty:
+            return False
+        self.__get_current_price(symbol)
+        return True
+
+    def migrate_cache(self):
+        """
+        Reads every cached csv and rewrites it de-duplicated, rolled up to tiered resolution and sorted by time (latest first)
+
+        Returns
+        -------
+        int
+            number of migrated files
+        """
+        count = 0
+        for symbol in self.get_symbols():
+            dfs = self.__load_symbol(symbol)
+            if dfs is None:
+                continue
+            dfs = rollup(dfs.drop_duplicates(keep='first'), self.agg, self.raw_days, self.rollup_days)
+            self.data_df[symbol] = dfs
+            self.__save_symbol(dfs, symbol)
+            count += 1
+        return count
+
+    def _download(self, symbol):
+        """
+        Downloads 1-min bars of the (symbol) from the server, implemented by subclasses
+
+        Parameters
+        ----------
+        arg1 : str
+            Symbol
+
+        Returns
+        -------
+        Pandas Dataframe
+            downloaded bars with 'time' and price columns, None if nothing was downloaded
+        """
+        raise NotImplementedError
+
+    def _current_price(self, symbol):
+        """
+        Returns current price of the (symbol) from the server, implemented by subclasses
+
+        Parameters
+        ----------
+        arg1 : str
+            Symbol
+
+        Returns
+        -------
+        float
+            Current price of the symbol
+        """
+        raise NotImplementedError
+
+    def __load_symbol(self, symbol):
+        """
+        Reads cached csv of the (symbol) from local machine (path=self.data_folder)
+
+        Parameters
+        ----------
+        arg1 : str
+            Symbol
+
+        Returns
+        -------
+        Pandas Dataframe
+            cached data of the symbol, None if the symbol is not cached
+        """
+        if symbol in self.data_df:
+            return self.data_df[symbol]
+        if symbol not in self.cached_files:
+            return None
+        try:
+            dfn = pd.read_csv(self.cached_files[symbol])
+        except pd.errors.EmptyDataError:
+            logging.warning(f"Skipping empty cache file of {symbol}")
+            return None
+        dfn['time'] =  pd.to_datetime(dfn['time'])
+        dfn = rollup(dfn, self.agg, self.raw_days, self.rollup_days)
+        self.data_df[symbol] = dfn
+        return dfn
+
+    def __save_symbol(self, df, symbol):
+        """
+        Saves individial downloaded data of (symbol) into local machine (path=self.data_folder)
+
+        Parameters
+        ----------
+        arg1 : Pandas Dataframe
+            df, downloaded data
+        arg2 : str
+            Symbol
+        """
+        saveas = os.path.join(self.data_folder, f'{symbol}.csv')
+        df.to_csv(saveas, index=False)
+        logging.info(f"{symbol} data saved to {self.data_folder}")
+
+    def __get_current_price(self, symbol):
+        """
+        Private method returns current price of the (symbol), downloaded once per run
+
+        Parameters
+        ----------
+        arg1 : str
+            Symbol
+
+        Return
+        ------
+            float
+                Current price of the symbol
+        """
+        if symbol not in self.current_prices:
+            self.current_prices[symbol] = self._current_price(symbol)
+        return self.current_prices[symbol]
+
+    def __download_df(self, symbol, start=None, until=None):
+        """
+        Private method returns bars of the (symbol), downloading and merging new bars into the cache if needed
+
+        Parameters
+        ----------
+        arg1 : str
+            Symbol
+        arg2 : datetime
+            earliest time the prices are needed for, see is_cached() (default=None)
+        arg3 : datetime
+            latest time the prices are needed for, see is_cached() (default=None)
+
+        Returns
+        -------
+        Pandas DataFrame
+            bars of the symbol sorted by time (latest first)
+        """
+        # A symbol is downloaded at most once per run, later calls use the data in memory
+        download = symbol not in self.checked and not self.is_cached(symbol, start, until)
+        self.checked.add(symbol)
+
+        dfs = self.__load_symbol(symbol)
+        if dfs is None:
+            dfs = pd.DataFrame(columns=['time'] + list(self.agg))
+
+        if download:
+            logging.debug(f"{symbol}: New download")
+            df = self._download(symbol)
+            if df is not None:
+                dfs = rollup(merge(dfs, df), self.agg, self.raw_days, self.rollup_days)
+                if not dfs.empty:
+                    self.data_df[symbol] = dfs
+                    self.__save_symbol(dfs, symbol)
+        return dfs
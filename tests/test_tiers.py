@@ -0,0 +1,82 @@
+import datetime
+import numpy as np
+import pandas as pd
+
+from py.planner import plan_downloads, prefetch
+from py.tiers import get_price, merge, rollup, TieredData, STOCK_AGG, HISTORY_DAYS
+
+
+def trading_bars(start, end):
+    """
+    Returns 1-min weekday bars from 09:00 to 16:00 with close numbering the bars, latest first
+    """
+    times = pd.date_range(start, end, freq='min')
+    times = times[(times.dayofweek < 5) & (times.hour >= 9) & (times.hour < 16)]
+    bars = pd.DataFrame({'time' : times, 'open' : 1.0, 'high' : 1.0, 'low' : 1.0, 'close' : np.arange(len(times), dtype=float), 'volume' : 1})
+    return bars.iloc[::-1].reset_index(drop=True)
+
+
+def test_weekend_lookup_in_rolled_bar():
+    # Weekday bars rolled up to hourly: a Saturday lookup must land in the Monday bar holding the same time of day
+    bars = rollup(trading_bars('2021-06-01 09:00', '2021-09-30 16:00'), STOCK_AGG)
+    monday = bars[(bars['time'] >= '2021-06-07 09:00') & (bars['time'] < '2021-06-07 10:00')]
+    assert monday['bar'].iloc[0] == 60
+    assert get_price(bars, datetime.datetime(2021, 6, 5, 9, 45), 'close') == monday['close'].iloc[0]
+
+
+def test_raw_lookup():
+    bars = rollup(trading_bars('2021-09-20 09:00', '2021-09-30 16:00'), STOCK_AGG)
+    assert (bars['bar'] == 1).all()
+    bar = bars[bars['time'] == '2021-09-22 10:15']
+    assert get_price(bars, datetime.datetime(2021, 9, 22, 10, 15), 'close') == bar['close'].iloc[0]
+    # Between bars the next bar is used
+    after = bars[bars['time'] == '2021-09-23 09:00']
+    assert get_price(bars, datetime.datetime(2021, 9, 22, 18, 0), 'close') == after['close'].iloc[0]
+
+
+def test_merge_drops_bars_inside_rolled_bar():
+    cached = pd.DataFrame({'time' : pd.to_datetime(['2021-06-07 10:00', '2021-06-07 09:00']),
+                           'open' : 1.0, 'high' : 2.0, 'low' : 0.5, 'close' : [20.0, 10.0], 'volume' : 60, 'bar' : 60})
+    downloaded = pd.DataFrame({'time' : ['2021-06-07 09:30', '2021-06-07 11:05'],
+                               'open' : 3.0, 'high' : 3.0, 'low' : 3.0, 'close' : [30.0, 40.0], 'volume' : 1})
+    merged = merge(cached, downloaded)
+    assert list(merged['time']) == list(pd.to_datetime(['2021-06-07 11:05', '2021-06-07 10:00', '2021-06-07 09:00']))
+    assert list(merged['bar']) == [1, 60, 60]
+    assert get_price(merged, datetime.datetime(2021, 6, 7, 9, 30), 'close') == 10.0
+
+
+class FakeStocks(TieredData):
+    """
+    Stocks store serving the last HISTORY_DAYS of 1-min trading bars, counting downloads
+    """
+
+    def __init__(self, data_folder):
+        super().__init__(data_folder, 'stocks', STOCK_AGG, 'close', '1111100')
+        self.downloads = 0
+
+    def _download(self, symbol):
+        self.downloads += 1
+        now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None, second=0, microsecond=0)
+        bars = trading_bars(now - datetime.timedelta(days=HISTORY_DAYS), now)
+        bars['time'] = bars['time'].dt.strftime('%Y-%m-%d %H:%M:%S')
+        return bars
+
+    def _current_price(self, symbol):
+        return 1.0
+
+
+def test_second_run_plans_no_downloads(tmp_path):
+    # Weekend, pre-market and older than HISTORY_DAYS alerts must not be downloaded again
+    now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    saturday = (now - datetime.timedelta(days=now.weekday() + 2)).replace(hour=12)
+    alerts = [('AAPL', now - datetime.timedelta(days=days), 'Stocks') for days in (1, 13, 29, 45)]
+    alerts += [('AAPL', saturday, 'Stocks'), ('MSFT', (now - datetime.timedelta(days=3)).replace(hour=4), 'Stocks')]
+
+    store = FakeStocks(str(tmp_path))
+    prefetch(alerts, {'Stocks' : store, 'Cryptos' : store})
+    assert store.downloads == 2
+
+    store = FakeStocks(str(tmp_path))
+    assert not any(not entry['Cached'] for entry in plan_downloads(alerts, {'Stocks' : store}))
+    prefetch(alerts, {'Stocks' : store, 'Cryptos' : store})
+    assert store.downloads == 0
@@ -1,10 +1,134 @@
-import tweepy, datetime, csv, json
-from py.crypto import CryptosData
-from py.stocks import StocksData
+import argparse, datetime, csv, glob, itertools, json, os
 import logging
 
+# pandas, requests and tweepy are imported on demand by the subcommands that need them,
+# cheap subcommands (stats) never pay their import or network cost.
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s', datefmt='%d-%b-%y %H:%M:%S')
 
+TWEET_FIELDS = ['ID', 'Symbol', 'Date', 'Tweet', 'Hint']
+STOCKS_FOLDER = './data/stocks'
+CRYPTOS_FOLDER = './data/cryptos'
+
+config = {}
+api = None
+stock_obj = None
+crypto_obj = None
+cashtag_extractor = None
+
+def load_config(config_filename):
+    """
+    Loads predefined params from config_filename into the module level config
+    
+    Parameters
+    ----------
+    arg1 : str
+        config json filename
+
+    Returns
+    -------
+    dict
+        config params
+    """
+    global config
+    with open(config_filename) as f:
+        config = json.load(f)
+    return config
+
+def get_api():
+    """
+    Returns tweepy API, logs in to Twitter on first call
+
+    Returns
+    -------
+    tweepy.API
+        authenticated tweepy API
+    """
+    global api
+    if api is None:
+        import tweepy
+        auth = tweepy.AppAuthHandler(config['tweepy_consumer_key'], config['tweepy_consumer_secret'])
+        api = tweepy.API(auth)
+    return api
+
+def tier_params():
+    """
+    Returns tiered resolution params of the data stores set in config
+
+    Returns
+    -------
+    dict
+        raw_days and rollup_days keyword arguments
+    """
+    params = {}
+    if 'raw_window_days' in config:
+        params['raw_days'] = config['raw_window_days']
+    if 'rollup_window_days' in config:
+        params['rollup_days'] = config['rollup_window_days']
+    return params
+
+def get_stock_obj():
+    """
+    Returns StocksData object, constructed on first call
+
+    Returns
+    -------
+    StocksData
+        stocks data object
+    """
+    global stock_obj
+    if stock_obj is None:
+        from py.stocks import StocksData
+        stock_obj = StocksData(STOCKS_FOLDER, config['alphavantage_apis'], config['iexcloud_api'], **tier_params())
+    return stock_obj
+
+def get_crypto_obj():
+    """
+    Returns CryptosData object, constructed on first call
+
+    Returns
+    -------
+    CryptosData
+        cryptos data object
+    """
+    global crypto_obj
+    if crypto_obj is None:
+        from py.crypto import CryptosData
+        crypto_obj = CryptosData(CRYPTOS_FOLDER, **tier_params())
+    return crypto_obj
+
+def get_extractor(extractor=None):
+    """
+    Returns (extractor) if given, else CashtagExtractor of cached stocks and Coingecko cryptos symbols built on first call
+
+    Parameters
+    ----------
+    arg1 : CashtagExtractor
+        optional extractor to use (default=None)
+
+    Returns
+    -------
+    CashtagExtractor
+        extractor of symbols from tweet text
+    """
+    global cashtag_extractor
+    if extractor is not None:
+        return extractor
+    if cashtag_extractor is None:
+        from py.cashtags import CashtagExtractor
+        crypto_symbols = [crypto['symbol'] for crypto in get_crypto_obj().get_cryptos()]
+        cashtag_extractor = CashtagExtractor(get_stock_obj().get_symbols(), crypto_symbols)
+    return cashtag_extractor
+
+def save_data():
+    """
+    Saves data of the stocks and cryptos objects constructed in this run
+    """
+    if stock_obj is not None:
+        stock_obj.save_data()
+    if crypto_obj is not None:
+        crypto_obj.save_data()
+
 def get_twitter_ids(ids_filename):
     """
     Returns Twitter user ids read from the filename: ids_filename
@@ -125,10 +249,52 @@ def create_csv(output):
         writer.writeheader()
  
 
-def get_prices(output, tweet_data, pref):
+def alert_store(tweet_data, pref):
+    """
+    Returns ticker a single tweet data is priced from first: its asset class hint if known, else the preffered(pref) ticker
+    
+    Parameters
+    ----------
+    arg1 : dict
+        single tweet data
+    arg2 : str
+        prefferd ticker (Stocks or Cryptos)
+
+    Returns
+    -------
+    str
+        Stocks or Cryptos
+    """
+    return tweet_data.get('Hint') or pref
+
+def price_alert(tweet_data, pref):
+    """
+    Returns prices of a single tweet data, from its asset class hint or else the preffered(pref) ticker,
+    falling back to the other one if it has no prices
+    
+    Parameters
+    ----------
+    arg1 : dict
+        single tweet data
+    arg2 : str
+        prefferd ticker (Stocks or Cryptos)
+
+    Returns
+    -------
+    tuple
+        tuple of prices (Alert Price, 2hr, 4hr, 1D, 1W, Current Price)
+    """
+    objs = (get_stock_obj, get_crypto_obj) if alert_store(tweet_data, pref) == 'Stocks' else (get_crypto_obj, get_stock_obj)
+    prices = objs[0]().get_prices(tweet_data['Symbol'], tweet_data['Date'])
+    if prices == ('NA', 'NA', 'NA', 'NA', 'NA', 'NA'):
+        prices = objs[1]().get_prices(tweet_data['Symbol'], tweet_data['Date'])
+    return prices
+
+def get_prices(output, tweet_data, pref, analytics=None, priced=None, collapse=False):
     """
     Gets all prices for the symbols in list of tweet data for the preffered(pref) ticker.
     Writes the data to ouptut csv.
+    Copies of an alert (same normalized text, symbol and minute) are priced once, see py.dedup.alert_key().
     
     Parameters
     ----------
@@ -138,25 +304,33 @@ def get_prices(output, tweet_data, pref):
         list of tweet_data
     arg3 : str
         prefferd ticker (Stocks or Cryptos)
+    arg4 : CallAnalytics
+        optional analytics, every written row is added to it (default=None)
+    arg5 : dict
+        alert key -> prices of alerts already priced, share between calls to dedup across Twitter ids (default=None)
+    arg6 : bool
+        write only the first row of copies of an alert (default=False)
     """
-    if pref == 'Stocks':
-        for d in tweet_data:
-            prices = stock_obj.get_prices(d['Symbol'], d['Date'])
-            if prices == ('NA', 'NA', 'NA', 'NA', 'NA', 'NA'):
-                prices = crypto_obj.get_prices(d['Symbol'], d['Date'])
-            write_csv(output, d, prices)
-    else:
-        for d in tweet_data:
-            prices = crypto_obj.get_prices(d['Symbol'], d['Date'])
-            if prices == ('NA', 'NA', 'NA', 'NA', 'NA', 'NA'):
-                prices = stock_obj.get_prices(d['Symbol'], d['Date'])
-            write_csv(output, d, prices)
-        
-    
+    from py.dedup import alert_key
 
-def tweets_data(id, days=30):
+    priced = {} if priced is None else priced
+    for d in tweet_data:
+        key = alert_key(d['Tweet'], d['Symbol'], d['Date']) + (alert_store(d, pref),)
+        if key in priced:
+            if collapse:
+                continue
+            prices = priced[key]
+        else:
+            prices = priced[key] = price_alert(d, pref)
+        write_csv(output, d, prices)
+        if analytics is not None:
+            analytics.add_row(d['ID'], d['Symbol'], prices)
+
+def tweets_data(id, days=30, extractor=None):
     """
     Gets tweets for the Twitter id(id) for previous days (default=30) up to previous 3000 tweets.
+    Symbols are taken from tweet entities, or from tweet text if (extractor) is given or the tweet has no 'symbols' entity key
+    (archived or third-party tweets). Bare tickers written without '$' are only picked up with an extractor.
     
     Parameters
     ----------
@@ -164,57 +338,325 @@ def tweets_data(id, days=30):
         Twitter Id
     arg2 : int
         upto days (default=30)
+    arg3 : CashtagExtractor
+        optional extractor of symbols from tweet text (default=None)
     Returns
     -------
     list
-        list of tweets data, each data constitues (User ID, Symbol in tweet, Date of Tweet, Tweet text)
+        list of tweets data, each data constitues (User ID, Symbol in tweet, Date of Tweet, Tweet text, asset class Hint of the symbol or None)
     """
+    import tweepy
+    from py.planner import to_utc
+
     tweet_data = []
     delta = date_delta(days)
 
     logging.info(f"Fetching tweets of ID: {id}")
-    for tweet in tweepy.Cursor(api.user_timeline, id=id).items():
+    for tweet in tweepy.Cursor(get_api().user_timeline, id=id).items():
         text = tweet.text
-        date = tweet.created_at
+        date = to_utc(tweet.created_at)
         if date.date() < delta:
             break
-        for symbol in tweet.entities['symbols']:
+        if extractor is None and 'symbols' in tweet.entities:
+            symbols = [(symbol['text'], None) for symbol in tweet.entities['symbols']]
+        else:
+            symbols = get_extractor(extractor).extract(text)
+        for symbol, hint in symbols:
             tweet_data.append({
                 'ID' : id, 
-                'Symbol' : symbol['text'], 
+                'Symbol' : symbol, 
                 'Date' : date, 
-                'Tweet' : text
+                'Tweet' : text,
+                'Hint' : hint
             })
 
     return tweet_data
 
+def dump_tweets_data(dump_filename, extractor):
+    """
+    Yields tweets data of an offline tweets dump, symbols are extracted from tweet text.
+    Dump is a csv file with columns ID, Date (ISO format) and Tweet.
+    
+    Parameters
+    ----------
+    arg1 : str
+        tweets dump filename
+    arg2 : CashtagExtractor
+        extractor of symbols from tweet text
+    Returns
+    -------
+    generator
+        tweets data, each data constitues (User ID, Symbol in tweet, Date of Tweet, Tweet text, asset class Hint of the symbol or None)
+    """
+    logging.info(f"Reading tweets dump from {dump_filename}")
+    with open(dump_filename, 'r', newline='', encoding='utf-8-sig') as csvfile:
+        rows, texts = itertools.tee(csv.DictReader(csvfile))
+        for row, symbols in zip(rows, extractor.extract_many(row['Tweet'] for row in texts)):
+            for symbol, hint in symbols:
+                yield {
+                    'ID' : row['ID'],
+                    'Symbol' : symbol,
+                    'Date' : row['Date'],
+                    'Tweet' : row['Tweet'],
+                    'Hint' : hint
+                }
 
 
-if __name__ == '__main__':
+def create_tweets_csv(filename):
+    """
+    Creates new harvested tweets csv file, with headers ('ID', 'Symbol', 'Date', 'Tweet', 'Hint')
+    
+    Parameters
+    ----------
+    arg1 : str
+        harvested tweets filename
+    """
+    with open(filename, 'w', newline='', encoding='utf-8-sig') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames = TWEET_FIELDS)
+        writer.writeheader()
+
+def write_tweets_csv(filename, tweet_data):
+    """
+    Appends list of tweet data to harvested tweets csv file
+    
+    Parameters
+    ----------
+    arg1 : str
+        harvested tweets filename
+    arg2 : list
+        list of tweet_data
+    """
+    with open(filename, 'a', newline='', encoding='utf-8-sig') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames = TWEET_FIELDS)
+        writer.writerows(tweet_data)
+
+def read_tweets_csv(filename):
+    """
+    Reads harvested tweets csv file, grouped by Twitter id in order of appearance.
+    Dates with a time zone offset are converted to naive UTC.
+    
+    Parameters
+    ----------
+    arg1 : str
+        harvested tweets filename
+
+    Returns
+    -------
+    dict
+        Twitter id -> list of tweet_data
+    """
+    from py.planner import to_utc
+
+    logging.info(f"Reading harvested tweets from {filename}")
+    tweets = {}
+    with open(filename, 'r', newline='', encoding='utf-8-sig') as csvfile:
+        for row in csv.DictReader(csvfile):
+            row['Date'] = to_utc(datetime.datetime.fromisoformat(row['Date'].replace('Z', '+00:00')))
+            row['Hint'] = row.get('Hint') or None
+            tweets.setdefault(row['ID'], []).append(row)
+    return tweets
+
+def count_rows(filename):
+    """
+    Returns number of data rows (excluding header) of a csv file, 0 if the file doesn't exist
+    
+    Parameters
+    ----------
+    arg1 : str
+        csv filename
+
+    Returns
+    -------
+    int
+        number of rows
+    """
+    if not os.path.exists(filename):
+        return 0
+    with open(filename, 'r', newline='', encoding='utf-8-sig') as csvfile:
+        return max(sum(1 for _ in csv.reader(csvfile)) - 1, 0)
+
+def get_analytics(args):
+    """
+    Returns CallAnalytics for streaming priced rows if --analyze was given, else None
+    """
+    if not getattr(args, 'analyze', False):
+        return None
+    from py.analytics import CallAnalytics
+    return CallAnalytics()
+
+def analytics_prefix(output):
+    """
+    Returns filename prefix of analytics reports for the output csv
+
+    Parameters
+    ----------
+    arg1 : str
+        output filename
+
+    Returns
+    -------
+    str
+        output filename without extension
+    """
+    return os.path.splitext(output)[0]
+
+def harvest(args):
+    """
+    harvest subcommand: fetches tweets of all Twitter ids and writes them to harvested tweets csv
+    """
+    extractor = get_extractor() if args.extract or args.dump else None
 
-    config = json.load(open('config.json')) # predefined params
+    create_tweets_csv(args.tweets)
+    if args.dump:
+        write_tweets_csv(args.tweets, dump_tweets_data(args.dump, extractor))
+        return
+    for id in get_twitter_ids(args.ids):
+        write_tweets_csv(args.tweets, tweets_data(id, days=args.days, extractor=extractor))
 
-    consumer_key = config['tweepy_consumer_key']
-    consumer_secret = config['tweepy_consumer_secret']
+def price_tweets(output, tweets, analytics=None, collapse=False):
+    """
+    Prices tweets of all Twitter ids into output csv.
+    Copies of an alert are priced once, data of all needed symbols is prefetched first, in priority order,
+    so pricing runs on local data.
     
-    # Login in to tweepy API
-    auth = tweepy.AppAuthHandler(consumer_key, consumer_secret)
-    api = tweepy.API(auth)
+    Parameters
+    ----------
+    arg1 : str
+        Output filepath
+    arg2 : dict
+        Twitter id -> list of tweet_data
+    arg3 : CallAnalytics
+        optional analytics, every written row is added to it (default=None)
+    arg4 : bool
+        write only the first row of copies of an alert (default=False)
+    """
+    from py.dedup import alert_key
+    from py.planner import prefetch
 
-    stock_obj = StocksData('./data/stocks', config['alphavantage_apis'], config['iexcloud_api'])
-    crypto_obj = CryptosData('./data/cryptos')
-    crypto_symbols = crypto_obj.get_cryptos()
+    crypto_symbols = get_crypto_obj().get_cryptos()
+    prefs = {id: preffered_ticker(data, crypto_symbols) for id, data in tweets.items()}
 
-    output = config['output_filename']
+    alerts = {}
+    for id, data in tweets.items():
+        for d in data:
+            store = alert_store(d, prefs[id])
+            key = alert_key(d['Tweet'], d['Symbol'], d['Date']) + (store,)
+            alerts.setdefault(key, (d['Symbol'], d['Date'], store))
+    logging.info(f"{sum(len(data) for data in tweets.values())} alerts, {len(alerts)} unique")
+    prefetch(list(alerts.values()), {'Stocks' : get_stock_obj(), 'Cryptos' : get_crypto_obj()})
+
+    priced = {}
     create_csv(output)
-    ids = get_twitter_ids(config['twiiter_ids_input'])
-    for id in ids:
-        data = tweets_data(id, days=30)
-        pref = preffered_ticker(data, crypto_symbols)
-        get_prices(output, data, pref)
+    for id, data in tweets.items():
+        get_prices(output, data, prefs[id], analytics, priced, collapse)
+    save_data()
+    if analytics is not None:
+        analytics.save(analytics_prefix(output))
+
+def price(args):
+    """
+    price subcommand: prices harvested tweets and writes them to output csv
+    """
+    price_tweets(args.output, read_tweets_csv(args.tweets), get_analytics(args), args.collapse)
 
-    stock_obj.save_data()
-    crypto_obj.save_data()
+def backfill(args):
+    """
+    backfill subcommand: harvests tweets of previous (days) and prices them into output csv
+    """
+    extractor = get_extractor() if args.extract else None
 
+    tweets = {}
+    for id in get_twitter_ids(args.ids):
+        tweets[id] = tweets_data(id, days=args.days, extractor=extractor)
+    price_tweets(args.output, tweets, get_analytics(args), args.collapse)
 
+def analyze(args):
+    """
+    analyze subcommand: computes per account and per symbol call performance of output csv
+    """
+    from py.analytics import CallAnalytics
+    analytics = CallAnalytics()
+    analytics.read_csv(args.output)
+    analytics.save(analytics_prefix(args.output))
+
+def migrate_cache(args):
+    """
+    migrate-cache subcommand: rewrites cached stocks and cryptos csv files rolled up to tiered resolution
+    """
+    stocks = get_stock_obj().migrate_cache()
+    cryptos = get_crypto_obj().migrate_cache()
+    logging.info(f"Migrated {stocks} stocks and {cryptos} cryptos cache files")
 
+def stats(args):
+    """
+    stats subcommand: prints counts of cached symbols, harvested tweets and output rows
+    """
+    print(f"Cached stocks: {len(glob.glob(os.path.join(STOCKS_FOLDER, '*.csv')))}")
+    print(f"Cached cryptos: {len(glob.glob(os.path.join(CRYPTOS_FOLDER, '*.csv')))}")
+    print(f"Harvested tweets ({args.tweets}): {count_rows(args.tweets)}")
+    print(f"Priced alerts ({args.output}): {count_rows(args.output)}")
+
+def parse_args(argv=None):
+    """
+    Parses command line arguments, running backfill when no subcommand is given
+    
+    Parameters
+    ----------
+    arg1 : list
+        command line arguments (default=sys.argv[1:])
+
+    Returns
+    -------
+    argparse.Namespace
+        parsed arguments, (func) is the subcommand to run
+    """
+    parser = argparse.ArgumentParser(description='Prices stocks and cryptos alerts tweeted by Twitter users.')
+    parser.add_argument('--config', default='config.json', help='config json filename (default: config.json)')
+    subparsers = parser.add_subparsers(dest='command')
+
+    days = argparse.ArgumentParser(add_help=False)
+    days.add_argument('--days', type=int, default=30, help='harvest tweets upto previous days (default: 30)')
+    ids = argparse.ArgumentParser(add_help=False)
+    ids.add_argument('--ids', help='Twitter ids csv (default: config twiiter_ids_input)')
+    tweets = argparse.ArgumentParser(add_help=False)
+    tweets.add_argument('--tweets', help='harvested tweets csv (default: config tweets_filename)')
+    output = argparse.ArgumentParser(add_help=False)
+    output.add_argument('--output', help='output csv (default: config output_filename)')
+    extract = argparse.ArgumentParser(add_help=False)
+    extract.add_argument('--extract', action='store_true', help='extract symbols from tweet text, including bare crypto tickers')
+    pricing = argparse.ArgumentParser(add_help=False)
+    pricing.add_argument('--analyze', action='store_true', help='also save call analytics of priced alerts')
+    pricing.add_argument('--collapse', action='store_true', help='write only the first row of copies of an alert (retweets, repeated posts)')
+
+    harvest_parser = subparsers.add_parser('harvest', parents=[days, ids, tweets, extract], help='fetch tweets to harvested tweets csv')
+    harvest_parser.add_argument('--dump', help='harvest offline tweets dump csv (ID, Date, Tweet) instead of Twitter, implies --extract')
+    harvest_parser.set_defaults(func=harvest)
+    subparsers.add_parser('price', parents=[tweets, output, pricing], help='price harvested tweets into output csv').set_defaults(func=price)
+    subparsers.add_parser('backfill', parents=[days, ids, output, extract, pricing], help='fetch and price tweets into output csv').set_defaults(func=backfill)
+    subparsers.add_parser('analyze', parents=[output], help='save per account and per symbol call analytics of output csv').set_defaults(func=analyze)
+    subparsers.add_parser('migrate-cache', help='rewrite cached stocks and cryptos csv files rolled up to tiered resolution').set_defaults(func=migrate_cache)
+    subparsers.add_parser('stats', parents=[tweets, output], help='print cache and output counts').set_defaults(func=stats)
+
+    args = parser.parse_args(argv)
+    if args.command is None:
+        args = parser.parse_args(['--config', args.config, 'backfill'])
+    return args
+
+def main(argv=None):
+    """
+    Command line entry point, runs the parsed subcommand with params from config json
+    """
+    args = parse_args(argv)
+    load_config(args.config)
+
+    if getattr(args, 'ids', None) is None:
+        args.ids = config.get('twiiter_ids_input')
+    if getattr(args, 'tweets', None) is None:
+        args.tweets = config.get('tweets_filename', 'Tweets_harvest.csv')
+    if getattr(args, 'output', None) is None:
+        args.output = config.get('output_filename')
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()